@@ -1,64 +1,170 @@
+if __name__ == "__main__":
+    # Served by gevent below - patch blocking I/O before anything else
+    # imports socket/threading. psycopg 3 waits on sockets through the
+    # patched select module, so database calls yield to other greenlets.
+    from gevent import monkey
+    monkey.patch_all()
+
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
+from gevent import monkey as gevent_monkey
+import gevent
+from functools import lru_cache, wraps
+import psycopg
+import psycopg.errors
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import ConnectionPool
+from cachetools import TTLCache
+from contextlib import contextmanager
+import atexit
 from urllib.parse import urlparse
 import logging
+import logging.handlers
 import sys
-from datetime import datetime
 import time
-import uuid
-from flask import g
+import itertools
+import threading
+import secrets
+import hmac
+import hashlib
+from flask import g, has_app_context
+import redis
+import orjson
 import sentry_sdk
 from sentry_sdk.integrations.flask import FlaskIntegration
 
 app = Flask(__name__)
 
 SENTRY_DSN = os.environ.get('SENTRY_DSN')
+SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', 0.05))
+
+# Probes and metrics scrapes are cheap and frequent - never trace them
+UNTRACED_PATHS = frozenset({"/api/health", "/api/readiness", "/api/metrics"})
+
+
+def sentry_traces_sampler(sampling_context):
+    environ = sampling_context.get("wsgi_environ") or {}
+    if environ.get("PATH_INFO") in UNTRACED_PATHS:
+        return 0
+    return SENTRY_TRACES_SAMPLE_RATE
+
 
 if SENTRY_DSN:
     sentry_sdk.init(
         dsn=SENTRY_DSN,
         integrations=[FlaskIntegration()],
-        traces_sample_rate=1.0,  # 100% of transactions for performance monitoring
+        traces_sampler=sentry_traces_sampler,  # SENTRY_TRACES_SAMPLE_RATE of transactions (default 5%)
+        profiles_sample_rate=0,
         environment="production"
     )
 
 # ================= LOGGING CONFIGURATION =================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+class BufferedStreamHandler(logging.handlers.MemoryHandler):
+    """
+    Collect log records and write each batch to the stream in one write()
 
-logger = logging.getLogger(__name__)
+    Batches are flushed when full, on any ERROR, and at least every
+    LOG_FLUSH_INTERVAL seconds by a background flusher, so the last lines
+    of a quiet worker still show up. logging.shutdown() flushes whatever is
+    left at exit. Records are still filtered (and get their request id) at
+    log time - only the write is deferred.
+    """
+
+    def __init__(self, stream, capacity=256, flush_interval=1.0):
+        super().__init__(capacity, flushLevel=logging.ERROR)
+        self.stream = stream
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.flusher_pid = None
+
+    def emit(self, record):
+        # Started lazily, and again in a forked child - threads don't survive fork
+        if self.flusher_pid != os.getpid():
+            self.flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_periodically, name="log-flusher", daemon=True).start()
+        try:
+            super().emit(record)
+        except Exception:
+            self.handleError(record)
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self.flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            if self.buffer:
+                last = self.buffer[-1]
+                try:
+                    self.flush()
+                except Exception:
+                    self.handleError(last)
+
+    def shouldFlush(self, record):
+        return (
+            super().shouldFlush(record)
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        )
 
-# Add request_id to logs
+    def flush(self):
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.buffer:
+                return
+            records, self.buffer = self.buffer, []
+
+            # A record that can't be formatted is reported and dropped, like
+            # StreamHandler does - it must not fail the caller or stay queued
+            lines = []
+            for record in records:
+                try:
+                    lines.append(self.format(record) + '\n')
+                except Exception:
+                    self.handleError(record)
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+
+
+# Add request_id to logs - on the handler, so records from every logger
+# (psycopg.pool, redis, sentry_sdk, ...) have the field the format needs
 class RequestIdFilter(logging.Filter):
     def filter(self, record):
-        record.request_id = getattr(g, 'request_id', 'N/A')
+        record.request_id = g.get('request_id', 'N/A') if has_app_context() else 'N/A'
         return True
 
-logger.addFilter(RequestIdFilter())
+
+LOG_BUFFER_SIZE = int(os.environ.get('LOG_BUFFER_SIZE', 256))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 1.0))
+
+log_handler = BufferedStreamHandler(sys.stdout, LOG_BUFFER_SIZE, LOG_FLUSH_INTERVAL)
+log_handler.addFilter(RequestIdFilter())
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s',
+    handlers=[log_handler]
+)
+
+logger = logging.getLogger(__name__)
 
 # ================= METRICS TRACKING =================
-from collections import defaultdict
-import threading
-from datetime import datetime
+from collections import defaultdict, OrderedDict
 
-# Global metrics storage (in-memory)
-metrics = defaultdict(float)  # Use float to support decimal values
-metrics_lock = threading.Lock()  # Thread safety
-metrics['app_start_time'] = datetime.now().timestamp()
+# Global metrics storage (in-memory), sharded per OS thread so the hot
+# path never takes a lock - each thread only ever writes to its own shard.
+# Under gevent all greenlets share one OS thread and cannot switch inside
+# an increment, so one shard per real thread is enough.
+_get_thread_ident = gevent_monkey.get_original('_thread', 'get_ident')
+metric_shards = {}  # OS thread id -> defaultdict(float) of that thread's metrics
+app_start_time = time.time()  # wall clock, reported as-is
+_app_start_ns = time.monotonic_ns()  # uptime is measured on the monotonic clock
 
 def track_metric(metric_name, value=1):
     """
-    Thread-safe metric tracking
+    Lock-free metric tracking
     
     Args:
         metric_name: Name of the metric to track
@@ -68,166 +174,770 @@ def track_metric(metric_name, value=1):
         track_metric('orders_placed')  # Increment by 1
         track_metric('orders_total_value', 599.99)  # Add specific value
     """
-    with metrics_lock:
-        metrics[metric_name] += value
+    ident = _get_thread_ident()
+    shard = metric_shards.get(ident)
+    if shard is None:
+        shard = metric_shards.setdefault(ident, defaultdict(float))
+    shard[metric_name] += value
 
 def get_all_metrics():
-    """Get a snapshot of all metrics (thread-safe)"""
-    with metrics_lock:
-        # Calculate uptime
-        uptime = datetime.now().timestamp() - metrics['app_start_time']
-        snapshot = dict(metrics)
-        snapshot['uptime_seconds'] = int(uptime)
-        snapshot['uptime_hours'] = round(uptime / 3600, 2)
-        return snapshot
+    """Get a snapshot of all metrics, summed across the per-thread shards"""
+    snapshot = defaultdict(float)
+    for shard in list(metric_shards.values()):
+        for name, value in dict(shard).items():
+            snapshot[name] += value
+
+    # Calculate uptime
+    uptime = (time.monotonic_ns() - _app_start_ns) / 1e9
+    snapshot = dict(snapshot)
+    snapshot['app_start_time'] = app_start_time
+    snapshot['uptime_seconds'] = int(uptime)
+    snapshot['uptime_hours'] = round(uptime / 3600, 2)
+    return snapshot
 
 # ================= CONFIGURATION =================
 SECRET_KEY = os.environ.get('SECRET_KEY', 'change-this-in-production')
 ADMIN_MOBILE = os.environ.get('ADMIN_MOBILE', '9999999999')
 DATABASE_URL = os.environ.get('DATABASE_URL')  # Render provides this automatically
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+# Statements are prepared server-side from their second run on a connection.
+# Set to "off" behind a transaction-pooling PgBouncer, which can't keep
+# prepared statements
+DB_PREPARE_THRESHOLD = os.environ.get('DB_PREPARE_THRESHOLD', '1')
+DB_PREPARE_THRESHOLD = None if DB_PREPARE_THRESHOLD == 'off' else int(DB_PREPARE_THRESHOLD)
+# Optional synchronous_commit for the app's sessions, e.g. "off" to stop
+# commits waiting for the WAL flush (a crash can lose the last few commits,
+# never corrupt data). Unset keeps the server's setting.
+DB_SYNCHRONOUS_COMMIT = os.environ.get('DB_SYNCHRONOUS_COMMIT')
+REDIS_URL = os.environ.get('REDIS_URL')  # Optional - caching is skipped when unset
 ALLOWED_ORIGINS = os.environ.get('ALLOWED_ORIGINS', '*').split(',')
 
 CORS(app, resources={
     r"/api/*": {
         "origins": ALLOWED_ORIGINS,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization", "Mobile"]
+        "allow_headers": ["Content-Type", "Authorization", "Mobile"],
+        "expose_headers": ["Content-Type"],
+        "max_age": 86400  # browsers reuse a preflight result for a day
     }
 })
 
 app.config['SECRET_KEY'] = SECRET_KEY
 
 
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson
+
+    orjson serializes dicts (including database rows) and datetimes
+    natively in C; anything else, like Decimal, falls back to Flask's default
+    conversion so responses keep the same shape.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = ORJSONProvider(app)
+
+
+def conditional_json(payload, max_age=None, etag=None):
+    """
+    JSON response with an ETag, answered with 304 Not Modified when the
+    client's If-None-Match already has it
+
+    The ETag defaults to a short BLAKE2b hash of the payload. With max_age,
+    browsers and CDNs may also reuse the body without asking for that long.
+    """
+    body = payload.encode() if isinstance(payload, str) else payload
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag or hashlib.blake2b(body, digest_size=8).hexdigest())
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+def ojson(obj, status=200):
+    """
+    JSON response encoded straight to bytes by orjson
+
+    jsonify goes through the provider's str result and re-encodes it; the
+    hot read endpoints skip that round-trip.
+    """
+    return app.response_class(
+        orjson.dumps(obj, default=app.json.default),
+        status=status,
+        mimetype="application/json"
+    )
+
+
 # ================= DATABASE =================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the shared PostgreSQL connection pool, creating it on first use
+
+    Rows come back as dicts. psycopg prepares a statement server-side once
+    it has run DB_PREPARE_THRESHOLD times on a connection, so the fixed
+    queries below skip parsing and planning from their second run on and
+    are sent by name rather than as full SQL text.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if not DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL is not set")
+                connect_kwargs = {
+                    "row_factory": dict_row,
+                    "prepare_threshold": DB_PREPARE_THRESHOLD
+                }
+                if DB_SYNCHRONOUS_COMMIT:
+                    connect_kwargs["options"] = f"-c synchronous_commit={DB_SYNCHRONOUS_COMMIT}"
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    kwargs=connect_kwargs,
+                    open=True
+                )
+                atexit.register(_pool.close)
+    return _pool
+
+
 def get_db_connection():
-    """Create PostgreSQL connection"""
-    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-    return conn
+    """
+    Borrow a PostgreSQL connection from the pool
+
+    Waits up to DB_POOL_TIMEOUT seconds for a free connection, then raises
+    psycopg_pool.PoolTimeout. Every connection must go back through
+    release_db_connection().
+    """
+    return get_pool().getconn()
+
+
+def release_db_connection(conn):
+    """Hand a borrowed connection back to the pool"""
+    get_pool().putconn(conn)
+
+
+@contextmanager
+def db_conn():
+    """
+    Borrow a pooled connection and always hand it back
+
+    For work outside a request (e.g. init_db) - views use get_db(). The
+    connection always goes back idle: whatever the caller left uncommitted
+    (a read like SELECT 1 still opens a transaction) is rolled back, on
+    success or on an exception.
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+        conn.rollback()  # no-op (no round-trip) when nothing is open
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+
+def get_db():
+    """Return the current app context's pooled connection, borrowing it on first use"""
+    if 'db' not in g:
+        g.db = get_db_connection()
+    return g.db
+
+
+def put_db():
+    """
+    Roll back and hand the context's connection back to the pool now
+
+    Views call this before slow work that doesn't need the database; a
+    later get_db() borrows a fresh connection.
+    """
+    conn = g.pop('db', None)
+    if conn is None:
+        return
+    try:
+        if not conn.closed:
+            conn.rollback()
+    except psycopg.Error:
+        pass  # Connection is broken - the pool discards it
+    finally:
+        release_db_connection(conn)
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    """
+    Hand the context's connection back to the pool, whatever happened
+
+    g belongs to the app context, so this also covers connections borrowed
+    outside a request (CLI commands, tests using app.app_context()).
+
+    Write views wrap their statements in conn.transaction(), which commits
+    once when the block exits; anything left uncommitted (a read-only
+    request, a handled or unhandled error) is rolled back here.
+    """
+    put_db()
 
 
 def init_db():
     """Initialize PostgreSQL database with tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        mobile VARCHAR(10) UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    # Products table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS products (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        quantity INTEGER NOT NULL,
-        price DECIMAL(10, 2) NOT NULL,
-        unit TEXT NOT NULL
-    )
-    """)
-
-    # Addresses table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS addresses (
-        id SERIAL PRIMARY KEY,
-        user_id INTEGER NOT NULL REFERENCES users(id),
-        name TEXT,
-        mobile VARCHAR(10),
-        address_line TEXT NOT NULL,
-        city TEXT,
-        state TEXT,
-        pincode VARCHAR(6)
-    )
-    """)
-
-    # Orders table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS orders (
-        id SERIAL PRIMARY KEY,
-        user_id INTEGER NOT NULL REFERENCES users(id),
-        address_id INTEGER NOT NULL REFERENCES addresses(id),
-        total_amount DECIMAL(10, 2) NOT NULL,
-        status TEXT DEFAULT 'PLACED',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    # Order items table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS order_items (
-        id SERIAL PRIMARY KEY,
-        order_id INTEGER NOT NULL REFERENCES orders(id),
-        product_name TEXT,
-        price DECIMAL(10, 2),
-        quantity INTEGER,
-        unit TEXT
-    )
-    """)
+    with db_conn() as conn, conn.cursor() as cursor:
+        # Users table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            mobile VARCHAR(10) UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+
+        # Products table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            unit TEXT NOT NULL,
+            CONSTRAINT products_quantity_nonnegative CHECK (quantity >= 0)
+        )
+        """)
+        # Tables created before the stock check: NOT VALID leaves existing
+        # rows alone but enforces it on every new write. The ALTER takes an
+        # ACCESS EXCLUSIVE lock, so it only runs when the constraint is
+        # actually missing - not on every deploy and container start.
+        cursor.execute("""
+        DO $$ BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = 'products_quantity_nonnegative'
+                  AND conrelid = 'products'::regclass
+            ) THEN
+                ALTER TABLE products ADD CONSTRAINT products_quantity_nonnegative
+                    CHECK (quantity >= 0) NOT VALID;
+            END IF;
+        EXCEPTION WHEN duplicate_object THEN NULL;  -- added concurrently
+        END $$
+        """)
+
+        # Addresses table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS addresses (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            name TEXT,
+            mobile VARCHAR(10),
+            address_line TEXT NOT NULL,
+            city TEXT,
+            state TEXT,
+            pincode VARCHAR(6)
+        )
+        """)
+
+        # Orders table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            address_id INTEGER NOT NULL REFERENCES addresses(id),
+            total_amount DECIMAL(10, 2) NOT NULL,
+            status TEXT DEFAULT 'PLACED',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+
+        # Order items table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            id SERIAL PRIMARY KEY,
+            order_id INTEGER NOT NULL REFERENCES orders(id),
+            product_name TEXT,
+            price DECIMAL(10, 2),
+            quantity INTEGER,
+            unit TEXT
+        )
+        """)
+
+        # Create indexes
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_mobile ON users(mobile)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_addresses_user ON addresses(user_id)")
+        # my_orders filters by user and sorts newest first
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_id_desc ON orders(user_id, id DESC)")
+        cursor.execute("DROP INDEX IF EXISTS idx_orders_user")  # superseded by the composite index
+        # Covers the items aggregation in the order lists, so it can be an index-only scan
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)
+            INCLUDE (id, product_name, price, quantity, unit)
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_order_items_order")  # superseded by the covering index
+        # Foreign key lookups from addresses to their orders (and the admin join)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_address ON orders(address_id)")
+
+        # Refresh planner statistics so new indexes are used straight away
+        cursor.execute("ANALYZE users, products, addresses, orders, order_items")
+
+        conn.commit()
+
+        build_users_bloom(conn)
+
+
+# ================= CACHE =================
+# Bump the version whenever the cached payload's shape changes, so workers
+# running old and new code never read each other's entries
+PRODUCTS_CACHE_KEY = "products:list:v1"
+PRODUCTS_CACHE_TTL = 300  # seconds
+SESSION_TTL = 3600  # seconds
+ADDRESSES_CACHE_TTL = 600  # seconds
+
+rds = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_timeout=0.5,
+    socket_connect_timeout=0.5
+) if REDIS_URL else None
+
+
+def cache_get(key):
+    """Read a cached value - any Redis failure is treated as a miss"""
+    if rds is None:
+        return None
+    try:
+        return rds.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache read failed for {key}: {str(e)}")
+        return None
+
+
+def cache_set(key, value, ttl):
+    """Store a value with an expiry, ignoring Redis failures"""
+    if rds is None:
+        return
+    try:
+        rds.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {str(e)}")
+
+
+def cache_delete(key):
+    """Invalidate a cached value, ignoring Redis failures"""
+    if rds is None:
+        return
+    try:
+        rds.delete(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache invalidation failed for {key}: {str(e)}")
+
 
-    # Create indexes
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_mobile ON users(mobile)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_addresses_user ON addresses(user_id)")
+# Each worker also keeps the product list JSON in memory for a few seconds,
+# so most requests skip Redis as well. Stored as one (payload, expires_at)
+# tuple: reads and writes are a single reference swap, no lock needed.
+# Invalidation is immediate in the worker that made the change; other
+# workers pick it up within PRODUCTS_LOCAL_TTL.
+PRODUCTS_LOCAL_TTL = 30  # seconds
+_products_local = (None, 0.0)
 
-    conn.commit()
-    cursor.close()
-    conn.close()
 
+def products_local_get():
+    payload, expires_at = _products_local
+    if payload is not None and time.monotonic() < expires_at:
+        return payload
+    return None
 
-# Initialize database on startup
-try:
+
+def products_local_set(payload):
+    global _products_local
+    _products_local = (payload, time.monotonic() + PRODUCTS_LOCAL_TTL)
+
+
+def invalidate_products():
+    """Drop the cached product list after products or stock levels change"""
+    global _products_local
+    _products_local = (None, 0.0)
+    cache_delete(PRODUCTS_CACHE_KEY)
+
+
+# ================= USER LOOKUP =================
+USER_ID_CACHE_SIZE = 10000
+
+# mobile -> users.id, least recently used first
+_user_ids = OrderedDict()
+_user_ids_lock = threading.Lock()
+
+
+def remember_user_id(mobile, user_id):
+    """Add a mobile -> user id mapping to the in-process LRU cache"""
+    with _user_ids_lock:
+        _user_ids[mobile] = user_id
+        _user_ids.move_to_end(mobile)
+        if len(_user_ids) > USER_ID_CACHE_SIZE:
+            _user_ids.popitem(last=False)
+
+
+def get_user_id(cursor, mobile):
+    """
+    Return the users.id for a mobile number, or None if it is not registered
+
+    Ids never change once assigned, so they are cached per process. Misses
+    are not cached because the mobile can sign up later, but the registered
+    users filter answers most of them without a query.
+    """
+    with _user_ids_lock:
+        user_id = _user_ids.get(mobile)
+        if user_id is not None:
+            _user_ids.move_to_end(mobile)
+            return user_id
+
+    if not user_maybe_registered(mobile):
+        return None
+
+    # Plain tuple rows - a dict per lookup is wasted on a single column.
+    # prepare=True skips the warm-up threshold for this hot statement.
+    with cursor.connection.cursor(row_factory=tuple_row) as id_cursor:
+        id_cursor.execute("SELECT id FROM users WHERE mobile = %s", (mobile,), prepare=True)
+        row = id_cursor.fetchone()
+    if row is None:
+        return None
+
+    (user_id,) = row
+    remember_user_id(mobile, user_id)
+    return user_id
+
+
+# ================= REGISTERED USERS =================
+# A RedisBloom filter of every registered mobile, so lookups for unknown
+# mobiles (cold traffic, probing clients) return without a query. A Bloom
+# filter answers "definitely not" or "maybe", and "definitely not" only
+# holds while every user is in it: init_db fills the filter and only then
+# sets a plain ready key. Both keys must exist for a "no" to be trusted -
+# when either is missing (not built yet, evicted, or invalidated after a
+# failed add) every lookup goes to the database.
+USERS_BLOOM_KEY = "users:bf:v1"
+USERS_BLOOM_READY_KEY = "users:bf:v1:ready"
+USERS_BLOOM_ERROR_RATE = 0.001
+USERS_BLOOM_CAPACITY = 1000000
+USERS_BLOOM_BATCH = 10000
+USERS_BLOOM_RETRY_MAX = 30  # seconds between invalidation attempts, at most
+
+# Switched off when Redis doesn't know the BF.* commands (no RedisBloom) -
+# then no filter exists and nothing can answer "definitely not"
+_users_bloom_enabled = rds is not None
+_users_bloom_invalidating = threading.Lock()
+
+
+def _is_unknown_command(e):
+    return 'unknown command' in str(e).lower()
+
+
+def _disable_users_bloom(e):
+    global _users_bloom_enabled
+    _users_bloom_enabled = False
+    logger.warning(f"Registered users filter disabled: {str(e)}")
+
+
+def _drop_users_bloom():
+    rds.delete(USERS_BLOOM_READY_KEY, USERS_BLOOM_KEY)
+
+
+def invalidate_users_bloom():
+    """
+    Drop the filter and its ready key so no worker trusts it any more
+
+    Called when a sign-up may be missing from the filter. If Redis can't be
+    reached either, a background thread keeps retrying until it can - the
+    stale filter must not be trusted once Redis comes back. Until the next
+    init-db every lookup goes to the database.
+    """
+    try:
+        _drop_users_bloom()
+        return
+    except redis.RedisError as e:
+        logger.warning(f"Registered users filter invalidation failed, retrying: {str(e)}")
+
+    if _users_bloom_invalidating.acquire(blocking=False):
+        threading.Thread(target=_retry_invalidate_users_bloom, name="users-bloom-invalidate", daemon=True).start()
+
+
+def _retry_invalidate_users_bloom():
+    delay = 1
+    try:
+        while True:
+            time.sleep(delay)
+            try:
+                _drop_users_bloom()
+                logger.info("Registered users filter invalidated")
+                return
+            except redis.RedisError:
+                delay = min(delay * 2, USERS_BLOOM_RETRY_MAX)
+    finally:
+        _users_bloom_invalidating.release()
+
+
+def user_maybe_registered(mobile):
+    """
+    Return False only if the complete filter has never seen this mobile
+
+    Any doubt (no Redis, filter not built, Redis errors) returns True so
+    the caller asks the database.
+    """
+    if not _users_bloom_enabled:
+        return True
+    try:
+        # One round-trip: are both keys there, and has the filter seen it
+        with rds.pipeline(transaction=False) as pipe:
+            pipe.exists(USERS_BLOOM_KEY, USERS_BLOOM_READY_KEY)
+            pipe.execute_command("BF.EXISTS", USERS_BLOOM_KEY, mobile)
+            present, seen = pipe.execute()
+    except redis.RedisError as e:
+        if isinstance(e, redis.ResponseError) and _is_unknown_command(e):
+            _disable_users_bloom(e)
+        else:
+            logger.warning(f"Registered users filter read failed: {str(e)}")
+        return True
+    return present < 2 or bool(seen)
+
+
+def mark_user_registered(mobile):
+    """
+    Add a sign-up's mobile to the filter
+
+    auth calls this before the user row is inserted and again once it has
+    committed: the first keeps the filter from lagging behind the users
+    table, the second covers a rebuild that started in between. NOCREATE
+    means a missing filter is never silently recreated with default
+    settings. Any failed add (filter missing, unreachable, read-only or
+    out-of-memory Redis) invalidates the filter.
+    """
+    if not _users_bloom_enabled:
+        return
+    try:
+        rds.execute_command("BF.INSERT", USERS_BLOOM_KEY, "NOCREATE", "ITEMS", mobile)
+    except redis.RedisError as e:
+        if isinstance(e, redis.ResponseError) and _is_unknown_command(e):
+            _disable_users_bloom(e)
+            return
+        if 'not found' not in str(e).lower():  # no filter - nothing to warn about
+            logger.warning(f"Registered users filter add failed: {str(e)}")
+        invalidate_users_bloom()
+
+
+def build_users_bloom(conn):
+    """
+    Load every registered mobile into the filter - called by init_db
+
+    Always rebuilt from scratch, so a deploy repairs a filter that was
+    invalidated or went stale. The old filter and ready key are replaced by
+    an empty filter in one MULTI, it is filled from the users table, and
+    only then is the ready key set. A sign-up that commits after the users
+    snapshot adds itself once it has committed.
+    """
+    if not _users_bloom_enabled:
+        return
+    try:
+        with rds.pipeline(transaction=True) as pipe:
+            pipe.delete(USERS_BLOOM_READY_KEY, USERS_BLOOM_KEY)
+            pipe.execute_command("BF.RESERVE", USERS_BLOOM_KEY, USERS_BLOOM_ERROR_RATE, USERS_BLOOM_CAPACITY)
+            pipe.execute()
+
+        # Server-side cursor - the mobiles are streamed, not loaded at once
+        with conn.transaction(), conn.cursor(name="users_bloom", row_factory=tuple_row) as cursor:
+            cursor.execute("SELECT mobile FROM users")
+            while batch := cursor.fetchmany(USERS_BLOOM_BATCH):
+                rds.execute_command("BF.MADD", USERS_BLOOM_KEY, *(mobile for (mobile,) in batch))
+
+        rds.set(USERS_BLOOM_READY_KEY, 1)
+    except redis.RedisError as e:
+        if isinstance(e, redis.ResponseError) and _is_unknown_command(e):
+            _disable_users_bloom(e)
+            return
+        logger.warning(f"Registered users filter build failed: {str(e)}")
+        invalidate_users_bloom()
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create tables and indexes - run once per deploy: flask --app app init-db"""
     init_db()
     print("✅ Database initialized successfully")
-except Exception as e:
-    print(f"⚠️ Database initialization error: {e}")
+
+
+# Schema setup is a deploy step, not an import side effect - every worker
+# running the DDL on boot made them queue on each other's table locks.
+# RUN_DB_INIT=1 restores the old behaviour for single-process setups.
+if os.environ.get('RUN_DB_INIT'):
+    try:
+        init_db()
+        print("✅ Database initialized successfully")
+    except Exception as e:
+        print(f"⚠️ Database initialization error: {e}")
 
 
 # ================= UTILITIES =================
+@lru_cache(maxsize=4096)
+def _ascii_digits(mobile):
+    # isascii() is a constant-time flag check on str and keeps isdigit()
+    # from accepting other Unicode digits; both run in C, about twice as
+    # fast as a regex match
+    return mobile.isascii() and mobile.isdigit()
+
+
 def validate_mobile(mobile):
-    return mobile and isinstance(mobile, str) and len(mobile) == 10 and mobile.isdigit()
+    # Only 10 character strings reach the cache, so JSON values that aren't
+    # hashable (lists, dicts) or equal across types (1 == 1.0 == True) never
+    # hit it, and an entry never pins a large string
+    return type(mobile) is str and len(mobile) == 10 and _ascii_digits(mobile)
+
+
+_ADMIN_MOBILE_BYTES = ADMIN_MOBILE.encode('utf-8', 'surrogatepass')
+
+
+def is_admin_mobile(mobile):
+    """Constant-time comparison of a claimed mobile number against ADMIN_MOBILE"""
+    if type(mobile) is not str:
+        return False
+    return hmac.compare_digest(mobile.encode('utf-8', 'surrogatepass'), _ADMIN_MOBILE_BYTES)
+
+
+def user_role(mobile):
+    return "admin" if is_admin_mobile(mobile) else "customer"
 
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        mobile = None
+        # Cheapest sources first: header and URL need no I/O, a session token
+        # costs a Redis read, and the JSON body is only parsed as a last
+        # resort (get_json caches it for the view)
+        mobile = request.headers.get('Mobile') or kwargs.get('mobile') or session_mobile()
 
-        if request.is_json:
-            data = request.get_json(silent=True) or {}
+        if not mobile and request.is_json:
+            data = request.get_json(silent=True, cache=True) or {}
             mobile = data.get('mobile')
 
-        if not mobile:
-            mobile = kwargs.get('mobile')
+        if not is_admin_mobile(mobile):
+            return jsonify({"error": "Unauthorized access"}), 403
 
-        if not mobile:
-            mobile = request.headers.get('Mobile')
+        return f(*args, **kwargs)
 
-        if mobile != ADMIN_MOBILE:
-            return jsonify({"error": "Unauthorized access"}), 403
+    return decorated_function
+
+
+def create_session(mobile, user_id):
+    """
+    Issue a bearer token for a verified mobile number
+
+    The token maps to "<user id>:<mobile>" in Redis. Returns None when Redis
+    is not configured, since tokens are only stored there.
+    """
+    if rds is None:
+        return None
+    token = secrets.token_urlsafe(32)
+    cache_set(f"sess:{token}", f"{user_id}:{mobile}", SESSION_TTL)
+    return token
+
+
+def bearer_token():
+    """The token from the request's 'Authorization: Bearer <token>' header, if any"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    return auth_header[len('Bearer '):]
+
+
+def session_user():
+    """
+    Resolve the request's bearer token to (user id, mobile), or None
+
+    Tokens issued before user ids were stored map to a bare mobile; their
+    user id comes back as None.
+    """
+    token = bearer_token()
+    if token is None:
+        return None
+    value = cache_get(f"sess:{token}")
+    if value is None:
+        return None
+    user_id, _, mobile = value.rpartition(':')
+    return (int(user_id) if user_id else None), mobile
+
+
+def session_mobile():
+    """Resolve the request's bearer token to a mobile number"""
+    session = session_user()
+    return session[1] if session else None
+
+
+def login_cached(f):
+    """
+    Answer a login for the mobile the request's session token belongs to
+    without running the password KDF again - the token already proves it
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        session = session_user()
+        if session is not None:
+            user_id, mobile = session
+            data = request.get_json(silent=True) or {}
+            if data.get("mobile") == mobile:
+                if user_id is not None:
+                    remember_user_id(mobile, user_id)
+                role = user_role(mobile)
+                logger.info(f"Login from session token for mobile: {mobile[-4:]}**** - Role: {role}")
+                track_metric('login_successful')
+                return jsonify({"message": "Login successful", "role": role, "token": bearer_token()}), 200
 
         return f(*args, **kwargs)
 
     return decorated_function
 
+
+def addresses_cache_key(mobile):
+    return f"addr:{mobile}"
+
+# Request ids only correlate log lines, so a per-process counter is enough -
+# the pid prefix keeps them unique across workers (reset after a fork for
+# servers that import the app before forking)
+request_counter = itertools.count(1)
+request_id_prefix = f"{os.getpid():x}"
+
+
+def _reset_request_ids():
+    global request_counter, request_id_prefix
+    request_counter = itertools.count(1)
+    request_id_prefix = f"{os.getpid():x}"
+
+
+os.register_at_fork(after_in_child=_reset_request_ids)
+
 # ================= REQUEST LOGGING MIDDLEWARE =================
 @app.before_request
 def before_request():
     """Log incoming requests"""
-    g.start_time = time.time()
-    g.request_id = str(uuid.uuid4())[:8]  # Short request ID
+    g.start_ns = time.monotonic_ns()
+    g.request_id = f"{request_id_prefix}-{next(request_counter):x}"  # Short request ID
     logger.info(f"Request: {request.method} {request.path}")
 
 
 @app.after_request
 def after_request(response):
     """Log response time and status"""
-    if hasattr(g, 'start_time'):
-        elapsed = time.time() - g.start_time
+    if hasattr(g, 'start_ns'):
+        elapsed = (time.monotonic_ns() - g.start_ns) / 1e9
         logger.info(
             f"Response: {request.method} {request.path} - "
             f"Status: {response.status_code} - "
@@ -240,20 +950,45 @@ def after_request(response):
     return response
 
 # ================= HEALTH =================
+HEALTH_BODY = orjson.dumps({"status": "healthy"})
+HEALTH_ETAG = hashlib.blake2b(HEALTH_BODY, digest_size=8).hexdigest()
+
+
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    logger.info("Health check requested")
+    """Liveness: the process is up and serving - the database is not touched"""
+    # Response objects are mutated per request (CORS headers), so only the
+    # encoded body is shared
+    return conditional_json(HEALTH_BODY, etag=HEALTH_ETAG)
+
+
+@lru_cache(maxsize=1)
+def check_database(second):
+    """
+    Run SELECT 1 at most once per wall-clock second
+
+    Callers pass int(time.time()), so a burst of probes within the same
+    second shares one check. Returns None when healthy, else the error text.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        conn.close()
-        logger.info("Health check passed - database connected")
-        return jsonify({"status": "healthy", "database": "connected"}), 200
+        with db_conn() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return None
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return jsonify({"status": "unhealthy", "error": str(e)}), 500
+        return str(e)
+
+
+@app.route("/api/readiness", methods=["GET"])
+def readiness_check():
+    """Readiness: the database is reachable"""
+    logger.info("Readiness check requested")
+    error = check_database(int(time.time()))
+    if error is None:
+        logger.info("Readiness check passed - database connected")
+        return jsonify({"status": "healthy", "database": "connected"}), 200
+
+    logger.error(f"Readiness check failed: {error}")
+    return jsonify({"status": "unhealthy", "error": error}), 500
 
 # ================= METRICS =================
 @app.route("/api/metrics", methods=["GET"])
@@ -290,8 +1025,79 @@ def get_metrics():
     
     return jsonify(metrics_data), 200
 
+# ================= PASSWORDS =================
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+
+def run_off_hub(func, *args):
+    """
+    Run CPU-heavy work on a native thread when serving under gevent
+
+    Greenlets are only switched on I/O, so hashing inline would stall every
+    other request in the worker. argon2 releases the GIL, so the hub's
+    native threadpool lets it run alongside them. Without gevent there is no
+    hub to protect and the call runs inline.
+    """
+    if gevent_monkey.is_module_patched('threading'):
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+
+def hash_password(password):
+    return run_off_hub(password_hasher.hash, password)
+
+
+def _verify_password(stored_hash, password):
+    if not stored_hash.startswith('$argon2'):
+        # Accounts created before the switch to argon2 have Werkzeug hashes
+        return check_password_hash(stored_hash, password)
+    try:
+        return password_hasher.verify(stored_hash, password)
+    except (VerifyMismatchError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(stored_hash):
+    """True for legacy Werkzeug hashes and argon2 hashes with outdated parameters"""
+    if not stored_hash.startswith('$argon2'):
+        return True
+    try:
+        return password_hasher.check_needs_rehash(stored_hash)
+    except InvalidHashError:
+        return True
+
+
+# Recently verified logins, so clients that log in repeatedly skip the
+# KDF. Keys are an HMAC (with a per-process secret) of the stored hash and
+# the password - changing the password changes the stored hash, which
+# retires the old entry, and no plain password digest is kept in memory.
+PASSWORD_CACHE_TTL = 300
+_verified_logins = TTLCache(maxsize=10000, ttl=PASSWORD_CACHE_TTL)
+_verified_logins_lock = threading.Lock()
+_verified_logins_key = secrets.token_bytes(32)
+
+
+def verify_password(stored_hash, password):
+    key = hmac.new(
+        _verified_logins_key,
+        f"{stored_hash}\0{password}".encode('utf-8', 'surrogatepass'),
+        hashlib.sha256
+    ).digest()
+    with _verified_logins_lock:
+        if key in _verified_logins:
+            return True
+
+    if not run_off_hub(_verify_password, stored_hash, password):
+        return False
+
+    with _verified_logins_lock:
+        _verified_logins[key] = True
+    return True
+
+
 # ================= AUTH =================
 @app.route("/api/auth", methods=["POST"])
+@login_cached
 def auth():
     logger.info("Authentication attempt")
     data = request.get_json()
@@ -307,50 +1113,103 @@ def auth():
     if len(password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT password FROM users WHERE mobile=%s", (mobile,))
-    user = cursor.fetchone()
+    with get_db().cursor() as cursor:
+        cursor.execute("SELECT id, password FROM users WHERE mobile=%s", (mobile,))
+        user = cursor.fetchone()
+    # The KDF takes tens of milliseconds - end the read transaction and hand
+    # the connection back first, so a burst of logins can't hold the whole
+    # pool while hashing
+    put_db()
 
     if not user:
-        hashed = generate_password_hash(password)
-        cursor.execute("INSERT INTO users (mobile, password) VALUES (%s, %s)", (mobile, hashed))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        role = "admin" if mobile == ADMIN_MOBILE else "customer"
-        logger.info(f"New account created for mobile: {mobile[-4:]}**** - Role: {role}")
-        return jsonify({"message": "Account created", "role": role}), 201
-
-    if check_password_hash(user["password"], password):
-        cursor.close()
-        conn.close()
-        role = "admin" if mobile == ADMIN_MOBILE else "customer"
+        hashed = hash_password(password)
+        mark_user_registered(mobile)
+        conn = get_db()
+        with conn.transaction(), conn.cursor() as cursor:
+            # ON CONFLICT makes a concurrent signup for the same mobile a no-op
+            # here instead of a unique-violation error
+            cursor.execute("""
+                INSERT INTO users (mobile, password) VALUES (%s, %s)
+                ON CONFLICT (mobile) DO NOTHING
+                RETURNING id
+            """, (mobile, hashed))
+            created = cursor.fetchone()
+
+            if not created:
+                # Lost the race - check the password against the account that won
+                cursor.execute("SELECT id, password FROM users WHERE mobile=%s", (mobile,))
+                user = cursor.fetchone()
+        put_db()
+
+        if created:
+            mark_user_registered(mobile)  # in case init-db rebuilt the filter meanwhile
+            remember_user_id(mobile, created['id'])
+            role = user_role(mobile)
+            logger.info(f"New account created for mobile: {mobile[-4:]}**** - Role: {role}")
+            return jsonify({"message": "Account created", "role": role, "token": create_session(mobile, created['id'])}), 201
+
+    if verify_password(user["password"], password):
+        if password_needs_rehash(user["password"]):
+            # Upgrade the stored hash now that the plain password is known;
+            # matching on the old hash leaves a concurrent change untouched
+            new_hash = hash_password(password)
+            conn = get_db()
+            with conn.transaction(), conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE users SET password=%s WHERE mobile=%s AND password=%s",
+                    (new_hash, mobile, user["password"])
+                )
+            logger.info(f"Password hash upgraded for mobile: {mobile[-4:]}****")
+
+        remember_user_id(mobile, user["id"])
+        role = user_role(mobile)
         logger.info(f"Login successful for mobile: {mobile[-4:]}**** - Role: {role}")
         track_metric('login_successful')
-        return jsonify({"message": "Login successful", "role": role}), 200
+        return jsonify({"message": "Login successful", "role": role, "token": create_session(mobile, user["id"])}), 200
 
-    cursor.close()
-    conn.close()
     logger.warning(f"Failed login attempt for mobile: {mobile[-4:]}****")
     track_metric('login_failed')
     return jsonify({"error": "Invalid credentials"}), 401
 
 
 # ================= PRODUCTS =================
+# Browsers and CDNs may reuse the product list this long; kept short since
+# it carries stock levels
+PRODUCTS_BROWSER_TTL = 60  # seconds
+
+# The product list is built as JSON text by PostgreSQL, so no row objects
+# are created or encoded in Python. price is rendered as text, the same
+# string the Decimal column used to serialize to.
+PRODUCTS_JSON_QUERY = """
+    SELECT COUNT(*), COALESCE(json_agg(json_build_object(
+        'id', id, 'name', name, 'quantity', quantity,
+        'price', price::text, 'unit', unit
+    ) ORDER BY id), '[]')::text
+    FROM products
+"""
+
+
 @app.route("/api/products", methods=["GET"])
 def get_products():
     logger.info("Fetching all products")
     track_metric('products_viewed')
+
+    cached = products_local_get()
+    if cached is None:
+        cached = cache_get(PRODUCTS_CACHE_KEY)
+        if cached is not None:
+            products_local_set(cached)
+    if cached is not None:
+        return conditional_json(cached, max_age=PRODUCTS_BROWSER_TTL)
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products ORDER BY id")
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        logger.info(f"Successfully fetched {len(rows)} products")
-        return jsonify([dict(row) for row in rows]), 200
+        with get_db().cursor(row_factory=tuple_row) as cursor:
+            cursor.execute(PRODUCTS_JSON_QUERY)
+            count, payload = cursor.fetchone()
+        logger.info(f"Successfully fetched {count} products")
+        cache_set(PRODUCTS_CACHE_KEY, payload, PRODUCTS_CACHE_TTL)
+        products_local_set(payload)
+        return conditional_json(payload, max_age=PRODUCTS_BROWSER_TTL)
     except Exception as e:
         logger.error(f"Error fetching products: {str(e)}")
         return jsonify({"error": "Failed to fetch products"}), 500
@@ -360,15 +1219,17 @@ def get_products():
 @admin_required
 def add_product():
     data = request.get_json()
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO products (name, quantity, price, unit) VALUES (%s, %s, %s, %s)",
-        (data["name"], data["quantity"], data["price"], data["unit"])
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
+    conn = get_db()
+    try:
+        with conn.transaction(), conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO products (name, quantity, price, unit) VALUES (%s, %s, %s, %s)",
+                (data["name"], data["quantity"], data["price"], data["unit"])
+            )
+    except psycopg.errors.CheckViolation:
+        # products_quantity_nonnegative
+        return jsonify({"error": "Quantity cannot be negative"}), 400
+    invalidate_products()
     track_metric('products_added')
     return jsonify({"message": "Product added"}), 201
 
@@ -377,15 +1238,18 @@ def add_product():
 @admin_required
 def update_product(product_id):
     data = request.get_json()
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE products SET name=%s, quantity=%s, price=%s, unit=%s WHERE id=%s",
-        (data["name"], data["quantity"], data["price"], data["unit"], product_id)
-    )
-    conn.commit()
-    cursor.close()
-    conn.close()
+    conn = get_db()
+    try:
+        with conn.transaction(), conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE products SET name=%s, quantity=%s, price=%s, unit=%s WHERE id=%s",
+                (data["name"], data["quantity"], data["price"], data["unit"], product_id)
+            )
+    except psycopg.errors.CheckViolation:
+        # products_quantity_nonnegative - also hit when saving a legacy row
+        # that still has a negative quantity
+        return jsonify({"error": "Quantity cannot be negative"}), 400
+    invalidate_products()
     track_metric('products_updated')
     return jsonify({"message": "Product updated"}), 200
 
@@ -393,12 +1257,10 @@ def update_product(product_id):
 @app.route("/api/admin/products/<int:product_id>", methods=["DELETE"])
 @admin_required
 def delete_product(product_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    conn = get_db()
+    with conn.transaction(), conn.cursor() as cursor:
+        cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
+    invalidate_products()
     track_metric('products_deleted')
     return jsonify({"message": "Product deleted"}), 200
 
@@ -409,25 +1271,28 @@ def get_addresses(mobile):
     if not validate_mobile(mobile):
         return jsonify({"error": "Invalid mobile number"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE mobile=%s", (mobile,))
-    user = cursor.fetchone()
+    cached = cache_get(addresses_cache_key(mobile))
+    if cached is not None:
+        return app.response_class(cached, mimetype="application/json"), 200
 
-    if not user:
-        cursor.close()
-        conn.close()
-        return jsonify([]), 200
+    with get_db().cursor(row_factory=tuple_row) as cursor:
+        user_id = get_user_id(cursor, mobile)
+        if user_id is None:
+            return jsonify([]), 200
 
-    cursor.execute("""
-        SELECT id, name, mobile, address_line, city, state, pincode
-        FROM addresses WHERE user_id=%s
-    """, (user['id'],))
+        # Serialized by PostgreSQL, like the product list
+        cursor.execute("""
+            SELECT COALESCE(json_agg(json_build_object(
+                'id', id, 'name', name, 'mobile', mobile, 'address_line', address_line,
+                'city', city, 'state', state, 'pincode', pincode
+            ) ORDER BY id), '[]')::text
+            FROM addresses WHERE user_id=%s
+        """, (user_id,))
+
+        payload = cursor.fetchone()[0]
 
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify([dict(row) for row in rows]), 200
+    cache_set(addresses_cache_key(mobile), payload, ADDRESSES_CACHE_TTL)
+    return app.response_class(payload, mimetype="application/json"), 200
 
 
 @app.route("/api/address", methods=["POST"])
@@ -442,41 +1307,73 @@ def add_address():
     if not address_line:
         return jsonify({"error": "Address line is required"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE mobile=%s", (mobile,))
-    user = cursor.fetchone()
+    conn = get_db()
+    with conn.transaction(), conn.cursor() as cursor:
+        user_id = get_user_id(cursor, mobile)
+        if user_id is None:
+            return jsonify({"error": "User not found"}), 404
 
-    if not user:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "User not found"}), 404
-
-    user_id = user['id']
-    cursor.execute("""
-        INSERT INTO addresses
-        (user_id, name, mobile, address_line, city, state, pincode)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-    """, (
-        user_id,
-        data.get("name"),
-        mobile,
-        address_line,
-        data.get("city"),
-        data.get("state"),
-        data.get("pincode")
-    ))
-
-    address_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    conn.close()
+        cursor.execute("""
+            INSERT INTO addresses
+            (user_id, name, mobile, address_line, city, state, pincode)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            user_id,
+            data.get("name"),
+            mobile,
+            address_line,
+            data.get("city"),
+            data.get("state"),
+            data.get("pincode")
+        ))
+
+        address_id = cursor.fetchone()['id']
+
+    cache_delete(addresses_cache_key(mobile))
     track_metric('addresses_added')
     return jsonify({"message": "Address saved successfully", "id": address_id}), 201
 
 
 # ================= ORDERS =================
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+
+
+def get_page_args():
+    """
+    Read keyset pagination arguments: ?limit=<n>&before_id=<order id>
+
+    after_id is accepted as an alias of before_id (the page continues
+    after that order in newest-first order). Returns (limit, before_id);
+    before_id defaults to a value above any serial id so the first page
+    starts at the newest order.
+    """
+    limit = request.args.get('limit', ORDERS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, ORDERS_MAX_PAGE_SIZE))
+    before_id = request.args.get('before_id', type=int)
+    if before_id is None:
+        before_id = request.args.get('after_id', 2 ** 31, type=int)
+    return limit, before_id
+
+
+def order_page(orders, limit, id_key):
+    """Wrap a page of orders with the cursor for the next (older) page"""
+    next_cursor = orders[-1][id_key] if len(orders) == limit else None
+    return {"orders": orders, "next_cursor": next_cursor}
+
+
+# Items of each order aggregated into a JSON array, so a page of orders
+# and all of their items come back in a single query. price::text keeps
+# the "120.00" string the Decimal column used to serialize to
+ORDER_ITEMS_JSON = """
+    COALESCE(json_agg(json_build_object(
+        'product_name', oi.product_name, 'price', oi.price::text,
+        'quantity', oi.quantity, 'unit', oi.unit
+    ) ORDER BY oi.id) FILTER (WHERE oi.id IS NOT NULL), '[]') AS items
+"""
+
+
 @app.route("/api/order", methods=["POST"])
 def place_order():
     logger.info("Order placement initiated")
@@ -485,146 +1382,152 @@ def place_order():
     address_id = data.get("address_id")
     cart = data.get("cart")
 
-    if not mobile or not address_id or not cart:
+    if not mobile or not address_id or not cart or not isinstance(cart, list):
         return jsonify({"error": "Invalid order data"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE mobile=%s", (mobile,))
-    user = cursor.fetchone()
-
-    if not user:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "User not found"}), 404
-
-    user_id = user['id']
-    total = sum(item["price"] * item["quantity"] for item in cart)
-
-    cursor.execute("""
-        INSERT INTO orders (user_id, address_id, total_amount)
-        VALUES (%s, %s, %s)
-        RETURNING id
-    """, (user_id, address_id, total))
-
-    order_id = cursor.fetchone()['id']
+    # Only product ids and quantities are taken from the client - names,
+    # prices and units come from the products table
+    try:
+        product_ids = [int(item.get("product_id", item.get("id"))) for item in cart]
+        quantities = [int(item["quantity"]) for item in cart]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid order data"}), 400
 
-    for item in cart:
-        cursor.execute("""
-            INSERT INTO order_items
-            (order_id, product_name, price, quantity, unit)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            order_id,
-            item["name"],
-            item["price"],
-            item["quantity"],
-            item["unit"]
-        ))
+    if any(qty <= 0 for qty in quantities):
+        return jsonify({"error": "Invalid order data"}), 400
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # The stock decrement, the order row and its items are written by one
+    # statement. It locks the cart's products (in id order, so concurrent
+    # orders can't deadlock) and only touches stock when every product still
+    # exists; stock can't go below zero (products_quantity_nonnegative), so an
+    # oversold cart fails as a whole. The statement and the COMMIT are
+    # pipelined so they go to the server in one flight.
+    try:
+        conn = get_db()
+        with conn.cursor() as cursor:
+            user_id = get_user_id(cursor, mobile)
+            if user_id is None:
+                return jsonify({"error": "User not found"}), 404
+
+            with conn.pipeline():
+                cursor.execute("""
+                    WITH cart AS (
+                        SELECT * FROM unnest(%s::int[], %s::int[]) AS t(product_id, quantity)
+                    ),
+                    wanted AS (
+                        SELECT product_id, SUM(quantity) AS quantity
+                        FROM cart GROUP BY product_id
+                    ),
+                    locked AS (
+                        SELECT id FROM products
+                        WHERE id IN (SELECT product_id FROM wanted)
+                        ORDER BY id
+                        FOR UPDATE
+                    ),
+                    stock AS (
+                        UPDATE products p SET quantity = p.quantity - w.quantity
+                        FROM wanted w
+                        WHERE p.id = w.product_id
+                          AND (SELECT COUNT(*) FROM locked) = (SELECT COUNT(*) FROM wanted)
+                        RETURNING p.id, p.name, p.price, p.unit
+                    ),
+                    priced AS (
+                        SELECT s.name, s.price, s.unit, c.quantity
+                        FROM cart c
+                        JOIN stock s ON s.id = c.product_id
+                    ),
+                    new_order AS (
+                        INSERT INTO orders (user_id, address_id, total_amount)
+                        SELECT %s::int, %s::int, SUM(price * quantity) FROM priced
+                        HAVING COUNT(*) = %s::int
+                        RETURNING id, total_amount
+                    ),
+                    items AS (
+                        INSERT INTO order_items (order_id, product_name, price, quantity, unit)
+                        SELECT new_order.id, priced.name, priced.price, priced.quantity, priced.unit
+                        FROM new_order, priced
+                    )
+                    SELECT id, total_amount FROM new_order
+                """, (product_ids, quantities, user_id, address_id, len(cart)))
+                conn.commit()
+
+            order = cursor.fetchone()
+    except psycopg.errors.ForeignKeyViolation:
+        return jsonify({"error": "Invalid address"}), 400
+    except psycopg.errors.CheckViolation:
+        return jsonify({"error": "Not enough stock for this order"}), 409
+    except psycopg.Error as e:
+        logger.error(f"Order placement failed: {str(e)}")
+        return jsonify({"error": "Failed to place order"}), 500
+
+    if order is None:
+        return jsonify({"error": "Cart contains unknown products"}), 400
+
+    invalidate_products()  # stock levels changed
+    order_id = order['id']
+    total = order['total_amount']
     logger.info(f"Order placed successfully - Order ID: {order_id}, Total: ₹{total:.2f}")
     track_metric('orders_placed')
-    track_metric('orders_total_value', total)
+    track_metric('orders_total_value', float(total))
     return jsonify({"message": "Order placed", "order_id": order_id}), 201
 
 
 @app.route("/api/my-orders/<mobile>", methods=["GET"])
 def my_orders(mobile):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE mobile=%s", (mobile,))
-    user = cursor.fetchone()
+    limit, before_id = get_page_args()
 
-    if not user:
-        cursor.close()
-        conn.close()
-        return jsonify([]), 200
-
-    user_id = user['id']
-    cursor.execute("""
-        SELECT o.id, o.total_amount, o.status, o.created_at,
-               a.address_line, a.city
-        FROM orders o
-        JOIN addresses a ON o.address_id = a.id
-        WHERE o.user_id=%s
-        ORDER BY o.id DESC
-    """, (user_id,))
-
-    orders = cursor.fetchall()
-    result = []
-
-    for order in orders:
-        order_id = order['id']
-        cursor.execute("""
-            SELECT product_name, price, quantity, unit
-            FROM order_items
-            WHERE order_id=%s
-        """, (order_id,))
-        items = cursor.fetchall()
-
-        result.append({
-            "id": order['id'],
-            "total_amount": float(order['total_amount']),
-            "status": order['status'],
-            "created_at": order['created_at'].isoformat() if order['created_at'] else None,
-            "address_line": order['address_line'],
-            "city": order['city'],
-            "items": [dict(item) for item in items]
-        })
-
-    cursor.close()
-    conn.close()
-    return jsonify(result), 200
+    with get_db().cursor() as cursor:
+        user_id = get_user_id(cursor, mobile)
+        if user_id is None:
+            return ojson(order_page([], limit, "id"))
+
+        # Rows already have the response shape: total_amount is cast to a
+        # float in SQL and orjson encodes created_at and the items natively
+        cursor.execute(f"""
+            SELECT o.id, o.total_amount::float8 AS total_amount, o.status, o.created_at,
+                   a.address_line, a.city,
+                   {ORDER_ITEMS_JSON}
+            FROM orders o
+            JOIN addresses a ON o.address_id = a.id
+            LEFT JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.user_id=%s AND o.id < %s
+            GROUP BY o.id, a.address_line, a.city
+            ORDER BY o.id DESC
+            LIMIT %s
+        """, (user_id, before_id, limit))
+
+        orders = cursor.fetchall()
+
+    return ojson(order_page(orders, limit, "id"))
 
 
 @app.route("/api/admin/orders/<mobile>", methods=["GET"])
 @admin_required
 def admin_orders(mobile):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT o.id, u.mobile, o.total_amount, o.status, o.created_at,
-               a.name, a.address_line, a.city, a.state, a.pincode
-        FROM orders o
-        JOIN users u ON o.user_id = u.id
-        JOIN addresses a ON o.address_id = a.id
-        ORDER BY o.id DESC
-    """)
-
-    orders = cursor.fetchall()
-    result = []
-
-    for order in orders:
-        order_id = order['id']
-        cursor.execute("""
-            SELECT product_name, price, quantity, unit
-            FROM order_items
-            WHERE order_id=%s
-        """, (order_id,))
-        items_raw = cursor.fetchall()
-
-        result.append({
-            "order_id": order['id'],
-            "mobile": order['mobile'],
-            "total_amount": float(order['total_amount']),
-            "status": order['status'],
-            "created_at": order['created_at'].isoformat() if order['created_at'] else None,
-            "address": {
-                "name": order['name'],
-                "address_line": order['address_line'],
-                "city": order['city'],
-                "state": order['state'],
-                "pincode": order['pincode']
-            },
-            "items": [dict(item) for item in items_raw]
-        })
-
-    cursor.close()
-    conn.close()
-    return jsonify(result), 200
+    limit, before_id = get_page_args()
+
+    with get_db().cursor() as cursor:
+        cursor.execute(f"""
+            SELECT o.id AS order_id, u.mobile, o.total_amount::float8 AS total_amount,
+                   o.status, o.created_at,
+                   json_build_object(
+                       'name', a.name, 'address_line', a.address_line, 'city', a.city,
+                       'state', a.state, 'pincode', a.pincode
+                   ) AS address,
+                   {ORDER_ITEMS_JSON}
+            FROM orders o
+            JOIN users u ON o.user_id = u.id
+            JOIN addresses a ON o.address_id = a.id
+            LEFT JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.id < %s
+            GROUP BY o.id, u.mobile, a.id
+            ORDER BY o.id DESC
+            LIMIT %s
+        """, (before_id, limit))
+
+        orders = cursor.fetchall()
+
+    return ojson(order_page(orders, limit, "order_id"))
 
 
 @app.route("/api/admin/order/status", methods=["PUT"])
@@ -638,21 +1541,15 @@ def update_order_status():
     if not order_id or not status:
         return jsonify({"error": "Invalid data"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE orders SET status=%s WHERE id=%s",
-        (status, order_id)
-    )
-
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "Order not found"}), 404
+    conn = get_db()
+    with conn.transaction(), conn.cursor() as cursor:
+        cursor.execute(
+            "UPDATE orders SET status=%s WHERE id=%s",
+            (status, order_id)
+        )
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        if cursor.rowcount == 0:
+            return jsonify({"error": "Order not found"}), 404
 
     return jsonify({"message": "Status updated"}), 200
 
@@ -664,7 +1561,6 @@ def test_error():
 
 # ================= RUN =================
 if __name__ == "__main__":
+    from gevent.pywsgi import WSGIServer
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port)
-
-
+    WSGIServer(("0.0.0.0", port), app).serve_forever()
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for Kiyanshi Organics
+
+Picked up automatically when gunicorn is started from backend/:
+    gunicorn app:app
+
+Every value can be overridden with the environment variables below.
+"""
+
+import os
+
+# ================= SERVER SOCKET =================
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# ================= WORKERS =================
+# gevent workers overlap database and Redis waits, so a few processes serve
+# many concurrent requests. Gunicorn monkey-patches each worker before the
+# app is imported; preloading in the master would create locks before that
+# patch, so the app is loaded per worker. Each worker holds its own
+# DB_POOL_MAX database connections - keep workers * DB_POOL_MAX within the
+# database's connection limit.
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+preload_app = False
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+# ================= LOGGING =================
+accesslog = "-"
+errorlog = "-"
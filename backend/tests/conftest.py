@@ -5,6 +5,19 @@ This file is automatically loaded by pytest
 
 import pytest
 import os
+
+# Never run the suite against the real database, cache or error tracker: the
+# app reads these at import time, so they are redirected before importing it.
+# Set TEST_DATABASE_URL / TEST_REDIS_URL to run against disposable services.
+for name in ('DATABASE_URL', 'REDIS_URL'):
+    test_value = os.environ.get(f'TEST_{name}')
+    if test_value:
+        os.environ[name] = test_value
+    else:
+        os.environ.pop(name, None)
+os.environ.pop('SENTRY_DSN', None)
+os.environ.pop('RUN_DB_INIT', None)
+
 from app import app as flask_app
 
 @pytest.fixture
@@ -12,9 +25,6 @@ def app():
     """Create application for testing"""
     flask_app.config['TESTING'] = True
     
-    # Use test database (optional - for now we'll use same DB)
-    # In production, you'd use a separate test database
-    
     yield flask_app
 
 
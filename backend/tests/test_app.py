@@ -18,7 +18,380 @@ def test_health_check_returns_json(client):
     response = client.get('/api/health')
     
     # ASSERT
+    assert response.status_code == 200
     assert response.content_type == 'application/json'
     print("✅ Health check returns JSON!")
 
 
+def test_health_check_supports_etag(client):
+    """
+    Test that a repeated health check with If-None-Match gets 304 Not Modified
+    """
+    # ACT
+    first = client.get('/api/health')
+    repeat = client.get('/api/health', headers={'If-None-Match': first.headers['ETag']})
+
+    # ASSERT
+    assert first.status_code == 200
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+
+
+def test_health_check_does_not_touch_database(client, monkeypatch):
+    """
+    Test that the liveness check never borrows from the connection pool
+    """
+    import app as app_module
+
+    # ARRANGE
+    pool_calls = []
+    monkeypatch.setattr(app_module, 'get_pool', lambda: pool_calls.append(1))
+
+    # ACT
+    response = client.get('/api/health')
+
+    # ASSERT
+    assert response.status_code == 200
+    assert pool_calls == []
+
+
+def test_readiness_check_reports_unreachable_database(client, monkeypatch):
+    """
+    Test that the readiness check fails with 500 when there is no database
+    """
+    import app as app_module
+
+    # ARRANGE
+    monkeypatch.setattr(app_module, 'DATABASE_URL', None)
+    monkeypatch.setattr(app_module, '_pool', None)
+    app_module.check_database.cache_clear()
+
+    # ACT
+    response = client.get('/api/readiness')
+    app_module.check_database.cache_clear()
+
+    # ASSERT
+    assert response.status_code == 500
+    assert response.get_json()["status"] == "unhealthy"
+
+
+def test_readiness_check_reports_connected_database(client, monkeypatch):
+    """
+    Test that the readiness check passes when the database check succeeds
+    """
+    import app as app_module
+
+    # ARRANGE
+    monkeypatch.setattr(app_module, 'check_database', lambda second: None)
+
+    # ACT
+    response = client.get('/api/readiness')
+
+    # ASSERT
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "healthy", "database": "connected"}
+
+
+# ==================== TEST 2: Admin Routes Reject Non-Admins ====================
+
+def test_admin_route_rejects_missing_mobile(client):
+    """
+    Test that admin routes return 403 when no mobile is supplied
+    """
+    # ACT
+    response = client.delete('/api/admin/products/1')
+
+    # ASSERT
+    assert response.status_code == 403
+    assert response.get_json() == {"error": "Unauthorized access"}
+
+
+def test_admin_route_rejects_non_admin_mobile(client):
+    """
+    Test that a non-admin Mobile header (or a non-string body value) is rejected
+    """
+    # ACT
+    header_response = client.delete('/api/admin/products/1', headers={'Mobile': '1234567890'})
+    body_response = client.delete('/api/admin/products/1', json={'mobile': 9999999999})
+
+    # ASSERT
+    assert header_response.status_code == 403
+    assert body_response.status_code == 403
+
+
+# ==================== TEST 3: Mobile Validation ====================
+
+def test_validate_mobile():
+    """
+    Test that only 10 ASCII digit strings are accepted
+    """
+    from app import validate_mobile
+
+    # ASSERT
+    assert validate_mobile('9876543210')
+    assert not validate_mobile('987654321')
+    assert not validate_mobile('98765432100')
+    assert not validate_mobile('98765x3210')
+    assert not validate_mobile('١٢٣٤٥٦٧٨٩٠')  # Arabic-Indic digits
+    assert not validate_mobile(9876543210)
+    assert not validate_mobile(None)
+
+
+# ==================== TEST 4: Order Pagination Arguments ====================
+
+def test_order_page_args(app):
+    """
+    Test that the page size is clamped and after_id works as a cursor alias
+    """
+    from app import get_page_args, ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE
+
+    # ACT
+    with app.test_request_context('/api/admin/orders/9999999999'):
+        first_page = get_page_args()
+    with app.test_request_context('/?limit=100000&after_id=120'):
+        large_page = get_page_args()
+    with app.test_request_context('/?limit=0&before_id=42'):
+        small_page = get_page_args()
+
+    # ASSERT
+    assert first_page == (ORDERS_PAGE_SIZE, 2 ** 31)
+    assert large_page == (ORDERS_MAX_PAGE_SIZE, 120)
+    assert small_page == (1, 42)
+
+
+# ==================== TEST 5: Password Hashing ====================
+
+def test_legacy_password_hashes_are_upgraded():
+    """
+    Test that legacy Werkzeug hashes still verify but are flagged for rehashing
+    """
+    from werkzeug.security import generate_password_hash
+    from app import hash_password, verify_password, password_needs_rehash
+
+    # ARRANGE
+    legacy_hash = generate_password_hash('secret123')
+    argon2_hash = hash_password('secret123')
+
+    # ASSERT
+    assert verify_password(legacy_hash, 'secret123')
+    assert not verify_password(legacy_hash, 'wrong-password')
+    assert password_needs_rehash(legacy_hash)
+    assert verify_password(argon2_hash, 'secret123')
+    assert not password_needs_rehash(argon2_hash)
+
+
+# ==================== TEST 6: Session Token Login ====================
+
+def test_login_with_session_token_skips_password_check(client, monkeypatch):
+    """
+    Test that a valid session token for the same mobile logs in without the KDF
+    """
+    import app as app_module
+
+    # ARRANGE
+    sessions = {'sess:tok123': '12:9876543210'}
+    monkeypatch.setattr(app_module, 'cache_get', sessions.get)
+
+    # ACT
+    response = client.post(
+        '/api/auth',
+        json={'mobile': '9876543210', 'password': 'not-checked'},
+        headers={'Authorization': 'Bearer tok123'}
+    )
+
+    # ASSERT
+    assert response.status_code == 200
+    assert response.get_json() == {"message": "Login successful", "role": "customer", "token": "tok123"}
+
+
+# ==================== TEST 7: Registered Users Filter ====================
+
+class FakeBloomRedis:
+    """Just enough of Redis + RedisBloom for the registered users filter"""
+
+    def __init__(self):
+        self.data = {}
+
+    def execute_command(self, command, key, *args):
+        import redis
+
+        if command == 'BF.RESERVE':
+            if key in self.data:
+                raise redis.ResponseError('item exists')
+            self.data[key] = set()
+        elif command == 'BF.INSERT':
+            if key not in self.data:
+                raise redis.ResponseError('not found')
+            self.data[key].update(args[args.index('ITEMS') + 1:])
+        elif command == 'BF.MADD':
+            self.data.setdefault(key, set()).update(args)
+        elif command == 'BF.EXISTS':
+            return int(args[0] in self.data.get(key, ()))
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        redis_client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def __getattr__(self, name):
+                return lambda *args: self.calls.append((name, args))
+
+            def execute(self):
+                return [getattr(redis_client, name)(*args) for name, args in self.calls]
+
+        return Pipeline()
+
+
+class FakeUsersConnection:
+    """A connection whose users table holds the given mobiles"""
+
+    def __init__(self, mobiles):
+        self.rows = [(mobile,) for mobile in mobiles]
+
+    def transaction(self):
+        from contextlib import nullcontext
+        return nullcontext()
+
+    def cursor(self, **kwargs):
+        rows = self.rows
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, query):
+                self.pending = list(rows)
+
+            def fetchmany(self, size):
+                batch, self.pending = self.pending[:size], self.pending[size:]
+                return batch
+
+        return Cursor()
+
+
+def test_registered_users_filter_only_trusted_when_ready(monkeypatch):
+    """
+    Test that the filter rules a mobile out only once it is marked ready,
+    and that a sign-up never recreates a missing filter
+    """
+    import app as app_module
+
+    # ARRANGE
+    fake_redis = FakeBloomRedis()
+    monkeypatch.setattr(app_module, '_users_bloom_enabled', True)
+    monkeypatch.setattr(app_module, 'rds', fake_redis)
+
+    # ACT / ASSERT - no filter: a sign-up doesn't create one, nothing is ruled out
+    app_module.mark_user_registered('9876543210')
+    assert app_module.USERS_BLOOM_KEY not in fake_redis.data
+    assert app_module.user_maybe_registered('1234567890')
+
+    # ACT / ASSERT - built filter
+    app_module.build_users_bloom(FakeUsersConnection(['9876543210']))
+    assert app_module.user_maybe_registered('9876543210')
+    assert not app_module.user_maybe_registered('1234567890')
+
+    # ACT / ASSERT - filter evicted while the ready key survives
+    del fake_redis.data[app_module.USERS_BLOOM_KEY]
+    assert app_module.user_maybe_registered('1234567890')
+
+
+def test_sign_up_during_filter_rebuild_is_not_lost(monkeypatch):
+    """
+    Test that a sign-up which adds itself before a rebuild, but commits
+    after the rebuild's users snapshot, still ends up in the filter
+    """
+    import app as app_module
+
+    # ARRANGE
+    fake_redis = FakeBloomRedis()
+    monkeypatch.setattr(app_module, '_users_bloom_enabled', True)
+    monkeypatch.setattr(app_module, 'rds', fake_redis)
+    app_module.build_users_bloom(FakeUsersConnection([]))
+
+    # ACT - add to the old filter, rebuild from a snapshot without the
+    # user, then the INSERT commits
+    app_module.mark_user_registered('9876543210')
+    app_module.build_users_bloom(FakeUsersConnection([]))
+    app_module.mark_user_registered('9876543210')
+
+    # ASSERT
+    assert app_module.user_maybe_registered('9876543210')
+
+
+def test_failed_registered_users_add_invalidates_filter(monkeypatch):
+    """
+    Test that a failed add (e.g. a read-only replica) drops the filter for
+    every worker instead of only switching it off locally
+    """
+    import redis
+    import app as app_module
+
+    class ReadOnlyBloom(FakeBloomRedis):
+        def execute_command(self, *args):
+            raise redis.exceptions.ReadOnlyError("You can't write against a read only replica.")
+
+    # ARRANGE
+    fake_redis = ReadOnlyBloom()
+    fake_redis.data = {app_module.USERS_BLOOM_KEY: set(), app_module.USERS_BLOOM_READY_KEY: 1}
+    monkeypatch.setattr(app_module, '_users_bloom_enabled', True)
+    monkeypatch.setattr(app_module, 'rds', fake_redis)
+
+    # ACT
+    app_module.mark_user_registered('9876543210')
+
+    # ASSERT
+    assert fake_redis.data == {}
+    assert app_module._users_bloom_enabled
+
+
+# ==================== TEST 8: Buffered Logging ====================
+
+def test_buffered_log_handler_survives_foreign_and_bad_records():
+    """
+    Test that records from other loggers get a request id and a record that
+    can't be formatted is dropped instead of breaking later flushes
+    """
+    import io
+    import logging
+    from app import BufferedStreamHandler, RequestIdFilter, log_handler
+
+    # ARRANGE
+    stream = io.StringIO()
+    handler = BufferedStreamHandler(stream, capacity=100, flush_interval=60)
+    handler.setFormatter(log_handler.formatter)
+    handler.addFilter(RequestIdFilter())
+    handler.handleError = lambda record: None
+
+    # ACT
+    handler.handle(logging.makeLogRecord({'name': 'psycopg.pool', 'msg': 'pool warning'}))
+    handler.handle(logging.makeLogRecord({'msg': '%d', 'args': ('not a number',)}))
+    handler.flush()
+    handler.handle(logging.makeLogRecord({'msg': 'next record'}))
+    handler.flush()
+
+    # ASSERT
+    assert '[N/A] - pool warning' in stream.getvalue()
+    assert 'next record' in stream.getvalue()
+    assert handler.buffer == []
@@ -11,12 +11,22 @@ import re
 from collections import Counter
 import sys
 
+# The app logs one "Response:" line per request carrying the endpoint, the
+# status and the time, so one anchored match reads all three at once:
+#   "Response: GET /api/products - Status: 200 - Time: 0.045s"
+_RESPONSE_RE = re.compile(r'Response: \w+ (\S+) - Status: (\d+) - Time: ([\d.]+)s')
+
+
 def parse_log_line(line):
     """
     Parse a single log line and extract useful information
     
+    The log format is fixed and " - " delimited, so the header is split
+    off instead of matched with a regex.
+
     Example input:
-    "2024-02-16 10:30:15 - INFO - [abc123] - Request: GET /api/products"
+    "2024-02-16 10:30:15,123 - app - INFO - [abc123] - Request: GET /api/products"
+    (lines without the logger name field are accepted too)
     
     Returns:
     {
@@ -25,18 +35,20 @@ def parse_log_line(line):
         'message': 'Request: GET /api/products'
     }
     """
-    # Pattern to match log format
-    pattern = r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).+?(\w+).+?\[.+?\].+?- (.+)'
-    
-    match = re.search(pattern, line)
-    if match:
-        timestamp, level, message = match.groups()
-        return {
-            'timestamp': timestamp,
-            'level': level,
-            'message': message.strip()
-        }
-    return None
+    parts = line.split(' - ', 4)
+    if len(parts) == 5 and parts[3].startswith('['):
+        timestamp, _name, level, _request_id, message = parts
+    elif len(parts) >= 4 and parts[2].startswith('['):
+        timestamp, level, _request_id = parts[:3]
+        message = ' - '.join(parts[3:])
+    else:
+        return None
+
+    return {
+        'timestamp': timestamp[:19],  # drop the ",milliseconds" suffix
+        'level': level,
+        'message': message.strip()
+    }
 
 
 def analyze_logs(log_file):
@@ -58,11 +70,12 @@ def analyze_logs(log_file):
     print(f"📖 Reading log file: {log_file}")
     
     try:
-        with open(log_file, 'r') as f:
-            lines = f.readlines()
-            print(f"📄 Found {len(lines)} log entries")
-            
-            for line in lines:
+        # Stream the file line by line (1 MB read buffer) so memory use
+        # doesn't grow with the size of the log
+        line_count = 0
+        with open(log_file, 'r', buffering=1 << 20) as f:
+            for line in f:
+                line_count += 1
                 parsed = parse_log_line(line)
                 if not parsed:
                     continue
@@ -74,34 +87,28 @@ def analyze_logs(log_file):
                     errors.append(parsed)
                 
                 # 2. Track endpoint usage
-                if 'Request:' in message:
+                if message.startswith('Request: '):
                     # Extract endpoint from "Request: GET /api/products"
                     parts = message.split()
                     if len(parts) >= 3:
-                        endpoint = parts[2]
-                        endpoint_stats[endpoint] += 1
-                
-                # 3. Track slow requests
-                if 'Response:' in message and 'Time:' in message:
-                    # Extract time from "Time: 1.234s"
-                    time_match = re.search(r'Time: ([\d.]+)s', message)
-                    if time_match:
-                        time_taken = float(time_match.group(1))
+                        endpoint_stats[parts[2]] += 1
+
+                # 3-4. Track status codes and slow requests (>1s)
+                elif message.startswith('Response: '):
+                    response_match = _RESPONSE_RE.match(message)
+                    if response_match:
+                        endpoint, status, time_taken = response_match.groups()
+                        status_codes[status] += 1
+                        time_taken = float(time_taken)
                         if time_taken > 1.0:  # Slow = more than 1 second
-                            endpoint_match = re.search(r'Response: \w+ (\S+)', message)
-                            if endpoint_match:
-                                slow_requests.append({
-                                    'endpoint': endpoint_match.group(1),
-                                    'time': time_taken,
-                                    'timestamp': parsed['timestamp']
-                                })
-                
-                # 4. Track HTTP status codes
-                if 'Status:' in message:
-                    status_match = re.search(r'Status: (\d+)', message)
-                    if status_match:
-                        status_codes[status_match.group(1)] += 1
+                            slow_requests.append({
+                                'endpoint': endpoint,
+                                'time': time_taken,
+                                'timestamp': parsed['timestamp']
+                            })
         
+        print(f"📄 Found {line_count} log entries")
+
         return {
             'errors': errors,
             'slow_requests': slow_requests,